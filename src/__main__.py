@@ -1,7 +1,18 @@
+from datetime import UTC, datetime
+from pathlib import Path
+
 import click
 
 from src.commands import LoadDataCommand
-from src.core.settings import get_settings
+from src.core.settings import Settings, get_settings
+
+profile_option = click.option("--profile", is_flag=True, help="Profile every process and save results on shutdown.")
+
+
+def _get_profile_dir(settings: Settings, *, profile: bool) -> Path | None:
+    if not profile:
+        return None
+    return settings.data_dir / "profiles" / datetime.now(UTC).strftime("%Y-%m-%dT%H-%M-%S")
 
 
 @click.group()
@@ -10,9 +21,10 @@ def cli() -> None:
 
 
 @cli.command()
-def load_data() -> None:
+@profile_option
+def load_data(*, profile: bool) -> None:
     settings = get_settings()
-    command = LoadDataCommand(settings)
+    command = LoadDataCommand(settings, profile_dir=_get_profile_dir(settings, profile=profile))
     command.execute()
 
 
@@ -17,7 +17,8 @@ class LoadDataCommand(BaseCommand):
         async_func: Callable[[Queue], Coroutine[Any, Any, None]],
         data_queue: LoadDataQueue,
     ) -> None:
-        asyncio.run(async_func(data_queue))
+        with self._profile("loader"):
+            asyncio.run(async_func(data_queue))
 
     async def _run_loader(self, data_queue: LoadDataQueue) -> None:
         setup_logging(self._settings)
@@ -34,10 +35,11 @@ class LoadDataCommand(BaseCommand):
         self._settings.data_dir.mkdir(parents=True, exist_ok=True)
 
         writer = WriterService(data_queue=data_queue, settings=self._settings)
-        writer.run()
+        with self._profile("writer"):
+            writer.run()
 
     def execute(self) -> None:
-        data_queue: LoadDataQueue = Queue()
+        data_queue: LoadDataQueue = Queue(maxsize=self._settings.loader.queue.maxsize)
         writer_process = Process(target=self._run_writer, args=(data_queue,))
         loader_process = Process(target=self._run_async_process, args=(self._run_loader, data_queue))
         try:
@@ -1,11 +1,23 @@
 from abc import ABC, abstractmethod
+from contextlib import AbstractContextManager
+from pathlib import Path
 
+from src.core.profiling import profile_process
 from src.core.settings import Settings
 
 
 class BaseCommand(ABC):
-    def __init__(self, settings: Settings) -> None:
+    def __init__(self, settings: Settings, *, profile_dir: Path | None = None) -> None:
         self._settings = settings
+        self._profile_dir = profile_dir
+
+    def _profile(self, name: str) -> AbstractContextManager[None]:
+        return profile_process(
+            self._profile_dir,
+            name,
+            snapshot_interval=self._settings.profile.snapshot_interval,
+            snapshots_count=self._settings.profile.snapshots_count,
+        )
 
     @abstractmethod
     def execute(self) -> None:
@@ -37,3 +37,21 @@ class DepthTypeEnum(AutoStrEnum):
 class DataTypeEnum(AutoStrEnum):
     DEPTH = auto()
     AGG_TRADE = auto()
+    EXCHANGE_INFO = auto()
+    BOOK_TICKER = auto()
+
+
+class QueuePolicyEnum(AutoStrEnum):
+    BLOCK = auto()
+    CONFLATE = auto()
+    DROP = auto()
+    SPILL = auto()
+
+
+class LatencyStageEnum(AutoStrEnum):
+    RECEIVED = auto()
+    DECODED = auto()
+    BOOK_UPDATED = auto()
+    ENQUEUED = auto()
+    DEQUEUED = auto()
+    WRITTEN = auto()
@@ -0,0 +1,86 @@
+import logging
+import time
+
+from src.core.enums import LatencyStageEnum
+
+_NS_IN_MS = 1_000_000
+_NS_IN_US = 1_000
+_BUCKETS_COUNT = 64
+
+_STAGES: list[LatencyStageEnum] = list(LatencyStageEnum)
+
+
+def start_stamps() -> list[int]:
+    return [time.time_ns()]
+
+
+def add_stamp(stamps: list[int] | None) -> None:
+    if stamps is not None:
+        stamps.append(time.time_ns() - stamps[0])
+
+
+class LatencyHistogram:
+    __slots__ = ("_buckets", "_count", "_max")
+
+    def __init__(self) -> None:
+        self._buckets = [0] * _BUCKETS_COUNT
+        self._count = 0
+        self._max = 0
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def add(self, value: int) -> None:
+        value = max(value, 0)
+        self._buckets[min(value.bit_length(), _BUCKETS_COUNT - 1)] += 1
+        self._count += 1
+        self._max = max(self._max, value)
+
+    def percentile(self, percent: float) -> int:
+        threshold = self._count * percent / 100
+        total = 0
+        for bucket, count in enumerate(self._buckets):
+            total += count
+            if total >= threshold:
+                return min(1 << bucket, self._max)
+        return self._max
+
+    def summary(self) -> str:
+        p50 = self.percentile(50) / _NS_IN_US
+        p99 = self.percentile(99) / _NS_IN_US
+        max_value = self._max / _NS_IN_US
+        return f"n={self._count} p50<={p50:.0f}us p99<={p99:.0f}us max={max_value:.0f}us"
+
+
+class LatencyTracker:
+    def __init__(self, *, report_interval: int) -> None:
+        self._logger = logging.getLogger()
+        self._report_interval = report_interval
+        self._histograms = {stage: LatencyHistogram() for stage in _STAGES[1:]}
+        self._total = LatencyHistogram()
+        self._clock_offset: int | None = None
+        self._reported_at = time.monotonic()
+
+    def add(self, exchange_time: int, stamps: list[int]) -> None:
+        previous_stamp = 0
+        for index in range(1, len(stamps)):
+            self._histograms[_STAGES[index]].add(stamps[index] - previous_stamp)
+            previous_stamp = stamps[index]
+        self._total.add(stamps[-1])
+        clock_offset = stamps[0] // _NS_IN_MS - exchange_time
+        if self._clock_offset is None or clock_offset < self._clock_offset:
+            self._clock_offset = clock_offset
+        if time.monotonic() - self._reported_at >= self._report_interval:
+            self.report()
+
+    def report(self) -> None:
+        if self._total.count:
+            for stage, histogram in self._histograms.items():
+                self._logger.info("latency %s: %s", stage, histogram.summary())
+            self._logger.info("latency total: %s", self._total.summary())
+            self._logger.info("latency clock offset: %s ms", self._clock_offset)
+        self._histograms = {stage: LatencyHistogram() for stage in _STAGES[1:]}
+        self._total = LatencyHistogram()
+        self._clock_offset = None
+        self._reported_at = time.monotonic()
@@ -0,0 +1,109 @@
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+_TOP_LIMIT = 30
+
+
+class _StageTimings:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.stages: dict[str, list[float]] = {}
+
+    def add(self, name: str, elapsed_time: float) -> None:
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = [1, elapsed_time, elapsed_time]
+            return
+        stage[0] += 1
+        stage[1] += elapsed_time
+        stage[2] = max(stage[2], elapsed_time)
+
+    def summary(self) -> str:
+        lines = [f"{'stage':<40} {'count':>10} {'total, s':>12} {'mean, s':>12} {'max, s':>12}"]
+        for name, (count, total, max_time) in sorted(self.stages.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<40} {count:>10.0f} {total:>12.3e} {total / count:>12.3e} {max_time:>12.3e}")
+        return "\n".join(lines)
+
+
+stage_timings = _StageTimings()
+
+
+def _take_snapshots(
+    profile_dir: Path,
+    name: str,
+    interval: float,
+    count: int,
+    stop_event: threading.Event,
+) -> None:
+    number = 0
+    while not stop_event.wait(interval):
+        tracemalloc.take_snapshot().dump(str(profile_dir / f"{name}-{number}.tracemalloc"))
+        (profile_dir / f"{name}-{number - count}.tracemalloc").unlink(missing_ok=True)
+        number += 1
+
+
+def _get_cpu_summary(profiler: cProfile.Profile) -> str:
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(_TOP_LIMIT)
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(_TOP_LIMIT)
+    return stream.getvalue()
+
+
+def _get_memory_summary(snapshot: tracemalloc.Snapshot) -> str:
+    return "\n".join(str(stat) for stat in snapshot.statistics("lineno")[:_TOP_LIMIT])
+
+
+@contextmanager
+def profile_process(
+    profile_dir: Path | None,
+    name: str,
+    *,
+    snapshot_interval: float = 60,
+    snapshots_count: int = 5,
+) -> Iterator[None]:
+    if profile_dir is None:
+        yield
+        return
+    logger = logging.getLogger()
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    stage_timings.enabled = True
+    tracemalloc.start()
+    stop_event = threading.Event()
+    snapshot_thread = threading.Thread(
+        target=_take_snapshots,
+        args=(profile_dir, name, snapshot_interval, snapshots_count, stop_event),
+        daemon=True,
+    )
+    snapshot_thread.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        stop_event.set()
+        snapshot_thread.join()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        snapshot.dump(str(profile_dir / f"{name}-final.tracemalloc"))
+        profiler.dump_stats(profile_dir / f"{name}.prof")
+        summary = "\n\n".join(
+            (
+                f"# {name}: cpu",
+                _get_cpu_summary(profiler),
+                f"# {name}: memory",
+                _get_memory_summary(snapshot),
+                f"# {name}: stages",
+                stage_timings.summary(),
+            ),
+        )
+        (profile_dir / f"{name}-summary.txt").write_text(summary)
+        logger.info("profile of %s saved to %s", name, profile_dir)
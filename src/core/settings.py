@@ -3,11 +3,12 @@ import re
 from pathlib import Path
 
 from dotenv import load_dotenv
-from msgspec import Struct, yaml
+from msgspec import Struct, field, yaml
 
-from src.core.enums import AppEnvEnum
+from src.core.enums import AppEnvEnum, QueuePolicyEnum
 
 BASE_DIR = Path(__file__).parents[2]
+CONFIG_PATH = BASE_DIR / "config.yml"
 
 
 class _OKXExchange(Struct):
@@ -20,22 +21,66 @@ class _Exchanges(Struct):
     okx: _OKXExchange | None
 
 
+class _Queue(Struct):
+    maxsize: int = 1000
+    depth_policy: QueuePolicyEnum = QueuePolicyEnum.CONFLATE
+    agg_trade_policy: QueuePolicyEnum = QueuePolicyEnum.SPILL
+    book_ticker_policy: QueuePolicyEnum = QueuePolicyEnum.CONFLATE
+
+    def __post_init__(self) -> None:
+        if self.depth_policy not in {QueuePolicyEnum.BLOCK, QueuePolicyEnum.CONFLATE, QueuePolicyEnum.DROP}:
+            msg = f"unsupported depth queue policy: {self.depth_policy}"
+            raise ValueError(msg)
+        if self.book_ticker_policy not in {QueuePolicyEnum.BLOCK, QueuePolicyEnum.CONFLATE, QueuePolicyEnum.DROP}:
+            msg = f"unsupported book_ticker queue policy: {self.book_ticker_policy}"
+            raise ValueError(msg)
+        if self.agg_trade_policy not in {QueuePolicyEnum.BLOCK, QueuePolicyEnum.SPILL}:
+            msg = f"unsupported agg_trade queue policy: {self.agg_trade_policy}"
+            raise ValueError(msg)
+
+
+class _Publisher(Struct):
+    socket_path: str | None = None
+    subscriber_queue_size: int = 1000
+
+
+class _Backfill(Struct):
+    enabled: bool = True
+    concurrency: int = 5
+    weight_limit: int = 1200
+    max_gap: int = 20000
+    buffer_size: int = 50000
+
+
+class _Profile(Struct):
+    snapshot_interval: float = 60
+    snapshots_count: int = 5
+
+
 class _Loader(Struct):
     depth_limit: int
     symbols: list[str]
+    queue: _Queue = field(default_factory=_Queue)
+    publisher: _Publisher = field(default_factory=_Publisher)
+    backfill: _Backfill = field(default_factory=_Backfill)
+    config_poll_interval: float = 5
+    book_ticker: bool = False
+    latency: bool = False
+    latency_report_interval: int = 60
 
 
 class Settings(Struct):
     env: AppEnvEnum
     loader: _Loader
     exchanges: _Exchanges
+    profile: _Profile = field(default_factory=_Profile)
     base_dir: Path = BASE_DIR
     data_dir: Path = BASE_DIR / "data"
 
 
 def get_settings() -> Settings:
     load_dotenv()
-    with Path(f"{BASE_DIR}/config.yml").open() as stream:
+    with CONFIG_PATH.open() as stream:
         data = stream.read()
     for match in re.finditer(r"\${(?P<env_value>.*)}", data):
         data = data.replace(match.group(), os.environ[match.group("env_value")])
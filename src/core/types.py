@@ -3,6 +3,10 @@ from typing import Any
 type DictStrAny = dict[str, Any]
 
 
+def to_scaled_int(value: str, step_size: str) -> int:
+    return round(float(value) / float(step_size))
+
+
 class ScaledPrice:
     __slots__ = ("_scale", "_value")
 
@@ -2,9 +2,13 @@ import asyncio
 import logging
 import time
 from collections.abc import Coroutine, Iterator
-from contextlib import contextmanager
+from contextlib import AbstractContextManager, contextmanager, nullcontext
 from typing import Any
 
+from src.core.profiling import stage_timings
+
+_NULL_CONTEXT = nullcontext()
+
 
 def create_safe_task(coro: Coroutine[Any, Any, Any], *, logger: logging.Logger) -> asyncio.Task:
     async def _wrapper() -> None:
@@ -20,13 +24,41 @@ def create_safe_task(coro: Coroutine[Any, Any, Any], *, logger: logging.Logger)
     return asyncio.create_task(_wrapper())
 
 
+class WeightLimiter:
+    def __init__(self, weight_limit: int, *, interval: float = 60) -> None:
+        self._weight_limit = weight_limit
+        self._interval = interval
+        self._used_weight = 0
+        self._window_start = time.monotonic()
+
+    async def acquire(self, weight: int) -> None:
+        while True:
+            now = time.monotonic()
+            if now - self._window_start >= self._interval:
+                self._window_start = now
+                self._used_weight = 0
+            if self._used_weight + weight <= self._weight_limit:
+                self._used_weight += weight
+                return
+            await asyncio.sleep(self._interval - (now - self._window_start))
+
+
+def check_speed(name: str, *, log: bool = True) -> AbstractContextManager[None]:
+    if not log and not stage_timings.enabled:
+        return _NULL_CONTEXT
+    return _check_speed(name, log=log)
+
+
 @contextmanager
-def check_speed(name: str) -> Iterator[None]:
-    logger = logging.getLogger()
+def _check_speed(name: str, *, log: bool) -> Iterator[None]:
     start_time = time.perf_counter()
     try:
         yield
     finally:
         end_time = time.perf_counter()
         elapsed_time = end_time - start_time
-        logger.info("%s: %.3e seconds", name, elapsed_time)
+        if stage_timings.enabled:
+            stage_timings.add(name, elapsed_time)
+        if log:
+            logger = logging.getLogger()
+            logger.info("%s: %.3e seconds", name, elapsed_time)
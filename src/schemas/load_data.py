@@ -1,24 +1,29 @@
+import struct
 from dataclasses import dataclass
 from multiprocessing import Queue
 
 from src.core.enums import TradeTypeEnum
 from src.core.types import DictStrAny, ScaledPrice
 
-type LoadDataQueue = Queue[DictStrAny | None]
+type LoadDataQueue = Queue[DictStrAny | bytes | None]
+
+# symbol, time, update id, bid price, bid quantity, ask price, ask quantity
+BOOK_TICKER_RECORD = struct.Struct("<16sqqqqqq")
 
 
 @dataclass(slots=True)
 class ExchangeInfoSchema:
     symbol: str
     tick_size: str
+    step_size: str
 
 
 @dataclass(slots=True)
 class DepthSchema:
     symbol: str
     last_update_id: int
-    bids: dict[ScaledPrice, str]
-    asks: dict[ScaledPrice, str]
+    bids: dict[ScaledPrice, int]
+    asks: dict[ScaledPrice, int]
     first_bid: ScaledPrice
     first_ask: ScaledPrice
 
@@ -30,10 +35,11 @@ class DepthEventSchema:
     first_update_id: int
     final_update_id: int
     last_final_update_id: int
-    bids: dict[ScaledPrice, str]
-    asks: dict[ScaledPrice, str]
+    bids: dict[ScaledPrice, int]
+    asks: dict[ScaledPrice, int]
     first_bid: ScaledPrice | None
     first_ask: ScaledPrice | None
+    stamps: list[int] | None = None
 
 
 @dataclass(slots=True)
@@ -43,4 +49,11 @@ class AggTradeEventSchema:
     trade_id: int
     time: int
     price: ScaledPrice
-    quantity: str
+    quantity: int
+    stamps: list[int] | None = None
+
+
+@dataclass(slots=True)
+class BookTickerEventSchema:
+    symbol: str
+    record: bytes
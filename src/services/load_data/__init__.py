@@ -1,7 +1,10 @@
 from .loader import LoaderService
+from .publisher import PublisherService, subscribe
 from .writer import WriterService
 
 __all__ = [
     "LoaderService",
+    "PublisherService",
     "WriterService",
+    "subscribe",
 ]
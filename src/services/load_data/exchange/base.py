@@ -10,7 +10,13 @@ from src.core.connection.http import HttpConnector
 from src.core.enums import ExchangeEnum
 from src.core.settings import Settings
 from src.core.types import DictStrAny
-from src.schemas.load_data import AggTradeEventSchema, DepthEventSchema, DepthSchema, ExchangeInfoSchema
+from src.schemas.load_data import (
+    AggTradeEventSchema,
+    BookTickerEventSchema,
+    DepthEventSchema,
+    DepthSchema,
+    ExchangeInfoSchema,
+)
 
 
 class ExchangeError(Exception):
@@ -87,11 +93,30 @@ class BaseExchangeAPI(ABC):
     async def get_depth(self, symbol: str, limit: int, *, exchange_info: dict[str, ExchangeInfoSchema]) -> DepthSchema:
         pass
 
+    @abstractmethod
+    def get_agg_trades(
+        self,
+        symbol: str,
+        from_id: int,
+        to_id: int,
+        *,
+        exchange_info: dict[str, ExchangeInfoSchema],
+    ) -> AsyncGenerator[list[AggTradeEventSchema]]:
+        pass
+
+    @abstractmethod
+    async def subscribe(self, symbols: set[str]) -> None:
+        pass
+
+    @abstractmethod
+    async def unsubscribe(self, symbols: set[str]) -> None:
+        pass
+
     @abstractmethod
     def listen_data(
         self,
         symbols: set[str],
         *,
         exchange_info: dict[str, ExchangeInfoSchema],
-    ) -> AsyncGenerator[DepthEventSchema | AggTradeEventSchema]:
+    ) -> AsyncGenerator[DepthEventSchema | AggTradeEventSchema | BookTickerEventSchema]:
         pass
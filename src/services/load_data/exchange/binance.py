@@ -1,22 +1,57 @@
+import asyncio
+from collections import deque
 from collections.abc import AsyncGenerator, Callable
 from typing import Annotated, ClassVar
 
-from aiohttp import WSMsgType
+import msgspec
+from aiohttp import ClientError, ClientWebSocketResponse, WSMsgType
 
+from src.core.connection.http import HttpConnector
 from src.core.enums import DataTypeEnum, ExchangeEnum, TradeTypeEnum
-from src.core.types import DictStrAny, ScaledPrice
-from src.schemas.load_data import AggTradeEventSchema, DepthEventSchema, DepthSchema, ExchangeInfoSchema
+from src.core.latency import add_stamp, start_stamps
+from src.core.settings import Settings
+from src.core.types import DictStrAny, ScaledPrice, to_scaled_int
+from src.core.utils import WeightLimiter
+from src.schemas.load_data import (
+    BOOK_TICKER_RECORD,
+    AggTradeEventSchema,
+    BookTickerEventSchema,
+    DepthEventSchema,
+    DepthSchema,
+    ExchangeInfoSchema,
+)
 
 from .base import BaseExchangeAPI, ExchangeError
 
 type EventDataStrategy = Callable[[DictStrAny, dict[str, ExchangeInfoSchema]], AggTradeEventSchema | DepthEventSchema]
 
 
+class _BookTickerData(msgspec.Struct, gc=False):
+    symbol: str = msgspec.field(name="s")
+    time: int = msgspec.field(name="T")
+    update_id: int = msgspec.field(name="u")
+    bid_price: str = msgspec.field(name="b")
+    bid_quantity: str = msgspec.field(name="B")
+    ask_price: str = msgspec.field(name="a")
+    ask_quantity: str = msgspec.field(name="A")
+
+
+class _BookTickerMessage(msgspec.Struct, gc=False):
+    stream: str
+    data: _BookTickerData
+
+
 class BinanceAPI(BaseExchangeAPI):
     _EXCHANGE = ExchangeEnum.BINANCE
     _API_URL = "https://fapi.binance.com/fapi/v1/"
     _WS_URL = "wss://fstream.binance.com/stream"
 
+    _AGG_TRADES_LIMIT = 1000
+    _AGG_TRADES_WEIGHT = 20
+    _AGG_TRADES_ATTEMPTS = 3
+    _BOOK_TICKER_STREAM = "@bookTicker"
+    _STREAM_PREFIX_SIZE = 64
+
     _TRADE_TYPE_MAP: ClassVar[dict[bool, TradeTypeEnum]] = {
         True: TradeTypeEnum.LONG,
         False: TradeTypeEnum.SHORT,
@@ -26,39 +61,89 @@ class BinanceAPI(BaseExchangeAPI):
         "depthUpdate": DataTypeEnum.DEPTH,
     }
 
+    def __init__(self, http: HttpConnector, *, settings: Settings) -> None:
+        super().__init__(http, settings=settings)
+        self._backfill_limiter = WeightLimiter(settings.loader.backfill.weight_limit)
+        self._ws: ClientWebSocketResponse | None = None
+        self._streams: set[str] = set()
+        self._book_ticker_decoder = msgspec.json.Decoder(_BookTickerMessage)
+        self._book_ticker_scales: dict[str, tuple[float, float]] = {}
+
+    def _get_streams(self, symbols: set[str]) -> list[str]:
+        params = [
+            param
+            for symbol in symbols
+            for param in (
+                f"{symbol.lower()}@depth@500ms",
+                f"{symbol.lower()}@aggTrade",
+            )
+        ]
+        if self._settings.loader.book_ticker:
+            params.extend(f"{symbol.lower()}{self._BOOK_TICKER_STREAM}" for symbol in symbols)
+        return params
+
+    async def _send_method(self, method: str, params: list[str]) -> None:
+        if self._ws is None or self._ws.closed:
+            return
+        request_data = self._json_encoder.encode({"method": method, "params": params})
+        await self._ws.send_frame(request_data, WSMsgType.TEXT)
+
     @staticmethod
     def _get_depth_data(
         data: list[Annotated[list[str], 2]],
-        tick_size: str,
+        exchange_info: ExchangeInfoSchema,
         *,
         is_reverse: bool = False,
-    ) -> tuple[dict[ScaledPrice, str], ScaledPrice | None]:
+    ) -> tuple[dict[ScaledPrice, int], ScaledPrice | None]:
         depth_data = {}
         first_price = None
         iterator = reversed(data) if is_reverse else data
 
         for price, qty in iterator:
-            scaled_price = ScaledPrice.from_price_and_tick(price, tick_size)
-            depth_data[scaled_price] = qty
-            if not first_price and qty != "0":
+            scaled_price = ScaledPrice.from_price_and_tick(price, exchange_info.tick_size)
+            scaled_qty = to_scaled_int(qty, exchange_info.step_size)
+            depth_data[scaled_price] = scaled_qty
+            if not first_price and scaled_qty:
                 first_price = scaled_price
 
         return depth_data, first_price
 
-    def _get_agg_trade(self, data: DictStrAny, _: dict[str, ExchangeInfoSchema]) -> AggTradeEventSchema:
+    def _get_agg_trade(self, data: DictStrAny, exchange_info: dict[str, ExchangeInfoSchema]) -> AggTradeEventSchema:
         return AggTradeEventSchema(
             symbol=data["s"],
             trade_type=self._TRADE_TYPE_MAP[data["m"]],
             trade_id=data["a"],
             time=data["T"],
             price=data["p"],
-            quantity=data["q"],
+            quantity=to_scaled_int(data["q"], exchange_info[data["s"]].step_size),
         )
 
+    def _get_book_ticker(
+        self,
+        data: _BookTickerData,
+        exchange_info: dict[str, ExchangeInfoSchema],
+    ) -> BookTickerEventSchema:
+        scales = self._book_ticker_scales.get(data.symbol)
+        if scales is None:
+            symbol_info = exchange_info[data.symbol]
+            scales = (float(symbol_info.tick_size), float(symbol_info.step_size))
+            self._book_ticker_scales[data.symbol] = scales
+        tick_size, step_size = scales
+        record = BOOK_TICKER_RECORD.pack(
+            data.symbol.encode(),
+            data.time,
+            data.update_id,
+            round(float(data.bid_price) / tick_size),
+            round(float(data.bid_quantity) / step_size),
+            round(float(data.ask_price) / tick_size),
+            round(float(data.ask_quantity) / step_size),
+        )
+        return BookTickerEventSchema(symbol=data.symbol, record=record)
+
     def _get_partial_depth(self, data: DictStrAny, exchange_info: dict[str, ExchangeInfoSchema]) -> DepthEventSchema:
-        tick_size = exchange_info[data["s"]].tick_size
-        bids, first_bid = self._get_depth_data(data["b"], tick_size, is_reverse=True)
-        asks, first_ask = self._get_depth_data(data["a"], tick_size)
+        symbol_info = exchange_info[data["s"]]
+        bids, first_bid = self._get_depth_data(data["b"], symbol_info, is_reverse=True)
+        asks, first_ask = self._get_depth_data(data["a"], symbol_info)
         return DepthEventSchema(
             symbol=data["s"],
             time=data["T"],
@@ -71,15 +156,29 @@ class BinanceAPI(BaseExchangeAPI):
             first_ask=first_ask,
         )
 
+    async def subscribe(self, symbols: set[str]) -> None:
+        params = self._get_streams(symbols)
+        self._streams.update(params)
+        await self._send_method("SUBSCRIBE", params)
+
+    async def unsubscribe(self, symbols: set[str]) -> None:
+        params = self._get_streams(symbols)
+        self._streams.difference_update(params)
+        for symbol in symbols:
+            self._book_ticker_scales.pop(symbol, None)
+        await self._send_method("UNSUBSCRIBE", params)
+
     async def get_info(self, symbols: set[str]) -> dict[str, ExchangeInfoSchema]:
         response = await self._request(self._GET, "exchangeInfo")
         result: dict[str, ExchangeInfoSchema] = {}
         for data in response["symbols"]:
             if data["symbol"] in symbols and data["status"] == "TRADING" and data["contractType"] == "PERPETUAL":
                 price_filter = next(f for f in data["filters"] if f["filterType"] == "PRICE_FILTER")
+                lot_size_filter = next(f for f in data["filters"] if f["filterType"] == "LOT_SIZE")
                 result[data["symbol"]] = ExchangeInfoSchema(
                     symbol=data["symbol"],
                     tick_size=price_filter["tickSize"],
+                    step_size=lot_size_filter["stepSize"],
                 )
         if result.keys() != symbols:
             msg = f"can not get all symbols: {symbols}"
@@ -89,9 +188,9 @@ class BinanceAPI(BaseExchangeAPI):
     async def get_depth(self, symbol: str, limit: int, *, exchange_info: dict[str, ExchangeInfoSchema]) -> DepthSchema:
         params = {"symbol": symbol, "limit": limit}
         response = await self._request(self._GET, "depth", params=params)
-        tick_size = exchange_info[symbol].tick_size
-        bids, first_bid = self._get_depth_data(response["bids"], tick_size)
-        asks, first_ask = self._get_depth_data(response["asks"], tick_size)
+        symbol_info = exchange_info[symbol]
+        bids, first_bid = self._get_depth_data(response["bids"], symbol_info)
+        asks, first_ask = self._get_depth_data(response["asks"], symbol_info)
         if not first_bid or not first_ask:
             msg = f"can not get first bid or ask for {symbol}"
             raise ExchangeError(msg)
@@ -104,31 +203,75 @@ class BinanceAPI(BaseExchangeAPI):
             first_ask=first_ask,
         )
 
+    async def get_agg_trades(
+        self,
+        symbol: str,
+        from_id: int,
+        to_id: int,
+        *,
+        exchange_info: dict[str, ExchangeInfoSchema],
+    ) -> AsyncGenerator[list[AggTradeEventSchema]]:
+        async def _get_page(page_from_id: int) -> list[AggTradeEventSchema]:
+            params = {"symbol": symbol, "fromId": page_from_id, "limit": self._AGG_TRADES_LIMIT}
+            error: Exception | None = None
+            for attempt in range(1, self._AGG_TRADES_ATTEMPTS + 1):
+                await self._backfill_limiter.acquire(self._AGG_TRADES_WEIGHT)
+                try:
+                    response = await self._request(self._GET, "aggTrades", params=params)
+                except (ExchangeError, ClientError) as e:
+                    self._logger.warning("can not get agg trades %s (attempt %d): %s", params, attempt, e)
+                    error = e
+                else:
+                    return [self._get_agg_trade({**data, "s": symbol}, exchange_info) for data in response]
+                if attempt < self._AGG_TRADES_ATTEMPTS:
+                    await asyncio.sleep(attempt)
+            self._logger.error("giving up on agg trades %s: %s", params, error)
+            return []
+
+        concurrency = self._settings.loader.backfill.concurrency
+        pages: deque[asyncio.Task[list[AggTradeEventSchema]]] = deque()
+        try:
+            for page_from_id in range(from_id, to_id + 1, self._AGG_TRADES_LIMIT):
+                pages.append(asyncio.create_task(_get_page(page_from_id)))
+                if len(pages) >= concurrency:
+                    yield [trade for trade in await pages.popleft() if trade.trade_id <= to_id]
+            while pages:
+                yield [trade for trade in await pages.popleft() if trade.trade_id <= to_id]
+        finally:
+            for page in pages:
+                page.cancel()
+
     async def listen_data(
         self,
         symbols: set[str],
         *,
         exchange_info: dict[str, ExchangeInfoSchema],
-    ) -> AsyncGenerator[DepthEventSchema | AggTradeEventSchema]:
-        params = [
-            param
-            for symbol in symbols
-            for param in (
-                f"{symbol.lower()}@depth@500ms",
-                f"{symbol.lower()}@aggTrade",
-            )
-        ]
+    ) -> AsyncGenerator[DepthEventSchema | AggTradeEventSchema | BookTickerEventSchema]:
+        params = self._get_streams(symbols)
+        self._streams = set(params)
         async with self._http.session.ws_connect(self._WS_URL) as ws:
-            request_data = self._json_encoder.encode({"method": "SUBSCRIBE", "params": params})
-            await ws.send_frame(request_data, WSMsgType.TEXT)
+            self._ws = ws
+            await self._send_method("SUBSCRIBE", params)
             async for msg in ws:
                 if msg.type == WSMsgType.ERROR:
                     break
+                if self._BOOK_TICKER_STREAM in msg.data[: self._STREAM_PREFIX_SIZE]:
+                    book_ticker = self._book_ticker_decoder.decode(msg.data)
+                    if book_ticker.stream in self._streams:
+                        yield self._get_book_ticker(book_ticker.data, exchange_info)
+                    continue
+                stamps = start_stamps() if self._settings.loader.latency else None
                 response: DictStrAny = self._json_decoder.decode(msg.data)
-                if response.get("stream") in params:
+                if response.get("stream") in self._streams:
                     data = response["data"]
                     data_type = self._DATA_TYPE_MAP[data["e"]]
+                    event: DepthEventSchema | AggTradeEventSchema
                     if data_type == DataTypeEnum.DEPTH:
-                        yield self._get_partial_depth(data, exchange_info)
+                        event = self._get_partial_depth(data, exchange_info)
                     elif data_type == DataTypeEnum.AGG_TRADE:
-                        yield self._get_agg_trade(data, exchange_info)
+                        event = self._get_agg_trade(data, exchange_info)
+                    else:
+                        continue
+                    add_stamp(stamps)
+                    event.stamps = stamps
+                    yield event
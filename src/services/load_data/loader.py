@@ -1,13 +1,29 @@
 import asyncio
 import logging
+import time
 from dataclasses import dataclass, field
 
+import msgspec
+from aiohttp import ClientError
+
 from src.core.enums import DataTypeEnum
-from src.core.settings import Settings
-from src.core.utils import create_safe_task
-from src.schemas.load_data import AggTradeEventSchema, DepthEventSchema, DepthSchema, ExchangeInfoSchema, LoadDataQueue
+from src.core.latency import add_stamp
+from src.core.settings import CONFIG_PATH, Settings, get_settings
+from src.core.types import DictStrAny
+from src.core.utils import check_speed, create_safe_task
+from src.schemas.load_data import (
+    AggTradeEventSchema,
+    BookTickerEventSchema,
+    DepthEventSchema,
+    DepthSchema,
+    ExchangeInfoSchema,
+    LoadDataQueue,
+)
 
 from .exchange import BaseExchangeAPI
+from .exchange.base import ExchangeError
+from .publisher import PublisherService
+from .queue import LoadDataSender
 
 
 @dataclass(slots=True)
@@ -23,6 +39,12 @@ class DepthData:
         self.depth_events.clear()
         self.depth_results.clear()
 
+    def remove_symbol(self, symbol: str) -> None:
+        self.filtered_symbol_events_map.pop(symbol, None)
+        self.prev_final_update_ids_map.pop(symbol, None)
+        self.depth_events.pop(symbol, None)
+        self.depth_results.pop(symbol, None)
+
     def is_valid_final_id(self, symbol: str, last_final_update_id: int) -> bool:
         if prev_final_update_id := self.prev_final_update_ids_map.get(symbol):
             return prev_final_update_id == last_final_update_id
@@ -47,8 +69,8 @@ class DepthData:
             for tick_number in range(depth_limit):
                 next_bid = depth_result.first_bid.get_next(-tick_number)
                 next_ask = depth_result.first_ask.get_next(tick_number)
-                new_bids[next_bid] = depth_event.bids.get(next_bid, depth_result.bids.get(next_bid, "0"))
-                new_asks[next_ask] = depth_event.asks.get(next_ask, depth_result.asks.get(next_ask, "0"))
+                new_bids[next_bid] = depth_event.bids.get(next_bid, depth_result.bids.get(next_bid, 0))
+                new_asks[next_ask] = depth_event.asks.get(next_ask, depth_result.asks.get(next_ask, 0))
             depth_result.bids = new_bids
             depth_result.asks = new_asks
         self.depth_events[symbol].clear()
@@ -69,6 +91,8 @@ class DepthData:
 
 
 class LoaderService:
+    _NEW_SYMBOLS_TIMEOUT = 10
+
     def __init__(
         self,
         *,
@@ -80,9 +104,16 @@ class LoaderService:
         self._symbols = set(settings.loader.symbols)
         self._depth_limit = settings.loader.depth_limit
         self._api = api
-        self._data_queue = data_queue
+        self._data_sender = LoadDataSender(data_queue, settings=settings)
+        self._publisher = PublisherService(settings=settings)
         self._settings = settings
         self._data = DepthData()
+        self._last_trade_ids: dict[str, int] = {}
+        self._backfill_buffers: dict[str, list[AggTradeEventSchema]] = {}
+        self._backfill_tasks: dict[str, asyncio.Task] = {}
+        self._config_mtime = CONFIG_PATH.stat().st_mtime
+        self._new_symbols: set[str] = set()
+        self._new_symbols_available = asyncio.Event()
 
     def _calculate_depth(self, data: DepthEventSchema) -> None:
         if not self._data.filtered_symbol_events_map.get(data.symbol):
@@ -94,50 +125,247 @@ class LoaderService:
             raise ValueError
         self._data.set_prev_final_update_id(data.symbol, data.final_update_id)
         self._data.update_depth_results(data.symbol, self._depth_limit)
-        self._data_queue.put(
-            {
-                "e": DataTypeEnum.DEPTH,
-                "s": data.symbol,
-                "t": data.time,
-                "b": self._data.depth_results[data.symbol].bids.copy(),
-                "a": self._data.depth_results[data.symbol].asks.copy(),
-            },
-        )
-
-    def _calculate_agg_trade(self, data: AggTradeEventSchema) -> None:
-        self._data_queue.put(
-            {
-                "e": DataTypeEnum.AGG_TRADE,
-                "m": data.trade_type,
-                "s": data.symbol,
-                "t": data.time,
-                "p": data.price,
-                "q": data.quantity,
-            },
-        )
+        add_stamp(data.stamps)
+        record = {
+            "e": DataTypeEnum.DEPTH,
+            "s": data.symbol,
+            "t": data.time,
+            "b": self._data.depth_results[data.symbol].bids.copy(),
+            "a": self._data.depth_results[data.symbol].asks.copy(),
+        }
+        self._stamp_record(record, data.stamps)
+        self._data_sender.put_depth(data.symbol, record)
+        self._publisher.publish(DataTypeEnum.DEPTH, data.symbol, record)
+
+    def _get_agg_trade_record(self, data: AggTradeEventSchema) -> DictStrAny:
+        return {
+            "e": DataTypeEnum.AGG_TRADE,
+            "m": data.trade_type,
+            "a": data.trade_id,
+            "s": data.symbol,
+            "t": data.time,
+            "p": data.price,
+            "q": data.quantity,
+        }
+
+    def _calculate_agg_trade(self, data: AggTradeEventSchema, *, publish: bool = True) -> None:
+        add_stamp(data.stamps)
+        record = self._get_agg_trade_record(data)
+        self._stamp_record(record, data.stamps)
+        self._data_sender.put_agg_trade(record)
+        if publish:
+            self._publisher.publish(DataTypeEnum.AGG_TRADE, data.symbol, record)
+
+    def _check_agg_trade(
+        self,
+        data: AggTradeEventSchema,
+        exchange_info: dict[str, ExchangeInfoSchema],
+        *,
+        publish: bool = True,
+    ) -> None:
+        if (buffer := self._backfill_buffers.get(data.symbol)) is not None:
+            if len(buffer) < self._settings.loader.backfill.buffer_size:
+                self._buffer_agg_trade(buffer, data, publish=publish)
+                return
+            self._logger.error("agg trade backfill buffer for %s is full, stopping backfill", data.symbol)
+            if backfill_task := self._backfill_tasks.pop(data.symbol, None):
+                backfill_task.cancel()
+            self._release_backfill_buffer(data.symbol, buffer, buffer[0].trade_id - 1, exchange_info)
+            self._check_agg_trade(data, exchange_info, publish=publish)
+            return
+        last_trade_id = self._last_trade_ids.get(data.symbol)
+        if last_trade_id is not None:
+            if data.trade_id <= last_trade_id:
+                return
+            if data.trade_id > last_trade_id + 1 and self._settings.loader.backfill.enabled:
+                self._start_backfill(data, last_trade_id + 1, exchange_info, publish=publish)
+                return
+        self._last_trade_ids[data.symbol] = data.trade_id
+        self._calculate_agg_trade(data, publish=publish)
+
+    def _buffer_agg_trade(self, buffer: list[AggTradeEventSchema], data: AggTradeEventSchema, *, publish: bool) -> None:
+        buffer.append(data)
+        if publish:
+            self._publisher.publish(DataTypeEnum.AGG_TRADE, data.symbol, self._get_agg_trade_record(data))
+
+    def _start_backfill(
+        self,
+        data: AggTradeEventSchema,
+        from_id: int,
+        exchange_info: dict[str, ExchangeInfoSchema],
+        *,
+        publish: bool,
+    ) -> None:
+        to_id = data.trade_id - 1
+        if to_id - from_id + 1 > (max_gap := self._settings.loader.backfill.max_gap):
+            self._logger.error("agg trade gap for %s is too big, skipping %d-%d", data.symbol, from_id, to_id - max_gap)
+            from_id = to_id - max_gap + 1
+        buffer: list[AggTradeEventSchema] = []
+        self._backfill_buffers[data.symbol] = buffer
+        self._buffer_agg_trade(buffer, data, publish=publish)
+        coro = self._backfill_agg_trades(data.symbol, from_id, to_id, buffer, exchange_info)
+        task = create_safe_task(coro, logger=self._logger)
+        self._backfill_tasks[data.symbol] = task
+        task.add_done_callback(lambda done_task: self._discard_backfill_task(data.symbol, done_task))
+
+    def _discard_backfill_task(self, symbol: str, task: asyncio.Task) -> None:
+        if self._backfill_tasks.get(symbol) is task:
+            del self._backfill_tasks[symbol]
+
+    def _release_backfill_buffer(
+        self,
+        symbol: str,
+        buffer: list[AggTradeEventSchema],
+        last_trade_id: int,
+        exchange_info: dict[str, ExchangeInfoSchema],
+    ) -> None:
+        if self._backfill_buffers.get(symbol) is not buffer:
+            return
+        del self._backfill_buffers[symbol]
+        self._last_trade_ids[symbol] = last_trade_id
+        for trade in buffer:
+            self._check_agg_trade(trade, exchange_info, publish=False)
+
+    async def _backfill_agg_trades(
+        self,
+        symbol: str,
+        from_id: int,
+        to_id: int,
+        buffer: list[AggTradeEventSchema],
+        exchange_info: dict[str, ExchangeInfoSchema],
+    ) -> None:
+        self._logger.warning("agg trade gap for %s: %d-%d, backfilling", symbol, from_id, to_id)
+        missing_ranges = []
+        next_id = from_id
+        try:
+            async for trades in self._api.get_agg_trades(symbol, from_id, to_id, exchange_info=exchange_info):
+                for trade in trades:
+                    if trade.trade_id < next_id:
+                        continue
+                    if trade.trade_id > next_id:
+                        missing_ranges.append((next_id, trade.trade_id - 1))
+                    next_id = trade.trade_id + 1
+                    self._calculate_agg_trade(trade)
+            if next_id <= to_id:
+                missing_ranges.append((next_id, to_id))
+            if missing_ranges:
+                self._logger.error("can not backfill agg trades for %s: %s", symbol, missing_ranges)
+        except asyncio.CancelledError:
+            self._logger.warning("agg trade backfill for %s is stopped, skipped %d-%d", symbol, next_id, to_id)
+            if self._backfill_buffers.get(symbol) is buffer:
+                del self._backfill_buffers[symbol]
+            raise
+        except Exception:
+            self._logger.exception("can not backfill agg trades for %s: %d-%d", symbol, next_id, to_id)
+        finally:
+            self._release_backfill_buffer(symbol, buffer, to_id, exchange_info)
+
+    def _stamp_record(self, record: DictStrAny, stamps: list[int] | None) -> None:
+        if stamps is not None:
+            add_stamp(stamps)
+            record["l"] = stamps
+
+    def _send_exchange_info(self, exchange_info: dict[str, ExchangeInfoSchema]) -> None:
+        time_ms = time.time_ns() // 1_000_000
+        for symbol_info in exchange_info.values():
+            self._data_sender.put_exchange_info(
+                symbol_info.symbol,
+                {
+                    "e": DataTypeEnum.EXCHANGE_INFO,
+                    "s": symbol_info.symbol,
+                    "t": time_ms,
+                    "ts": symbol_info.tick_size,
+                    "qs": symbol_info.step_size,
+                },
+            )
+
+    async def _add_symbols(self, symbols: set[str], exchange_info: dict[str, ExchangeInfoSchema]) -> None:
+        self._logger.info("adding symbols: %s", symbols)
+        try:
+            new_exchange_info = await self._api.get_info(symbols)
+        except (ExchangeError, ClientError):
+            self._logger.exception("can not get exchange info for %s", symbols)
+            return
+        exchange_info.update(new_exchange_info)
+        self._send_exchange_info(new_exchange_info)
+        self._symbols.update(symbols)
+        self._new_symbols = symbols
+        self._new_symbols_available.clear()
+        await self._api.subscribe(symbols)
+        try:
+            await asyncio.wait_for(self._new_symbols_available.wait(), timeout=self._NEW_SYMBOLS_TIMEOUT)
+            tasks = (self._api.get_depth(symbol, self._depth_limit, exchange_info=exchange_info) for symbol in symbols)
+            depth_symbols = await asyncio.gather(*tasks)
+        except (TimeoutError, ExchangeError, ClientError):
+            self._logger.exception("can not add symbols: %s", symbols)
+            await self._remove_symbols(symbols, exchange_info)
+            return
+        finally:
+            self._new_symbols = set()
+        for depth_symbol in depth_symbols:
+            self._data.depth_results[depth_symbol.symbol] = depth_symbol
+
+    async def _remove_symbols(self, symbols: set[str], exchange_info: dict[str, ExchangeInfoSchema]) -> None:
+        self._logger.info("removing symbols: %s", symbols)
+        await self._api.unsubscribe(symbols)
+        self._symbols.difference_update(symbols)
+        for symbol in symbols:
+            self._data.remove_symbol(symbol)
+            exchange_info.pop(symbol, None)
+            self._last_trade_ids.pop(symbol, None)
+            self._backfill_buffers.pop(symbol, None)
+            if backfill_task := self._backfill_tasks.pop(symbol, None):
+                backfill_task.cancel()
+            self._publisher.remove_symbol(symbol)
+
+    async def _watch_config(self, exchange_info: dict[str, ExchangeInfoSchema]) -> None:
+        while True:
+            await asyncio.sleep(self._settings.loader.config_poll_interval)
+            config_mtime = CONFIG_PATH.stat().st_mtime
+            if config_mtime == self._config_mtime:
+                continue
+            self._config_mtime = config_mtime
+            try:
+                symbols = set(get_settings().loader.symbols)
+            except (msgspec.MsgspecError, OSError, KeyError):
+                self._logger.exception("can not reload config")
+                continue
+            if added_symbols := symbols - self._symbols:
+                await self._add_symbols(added_symbols, exchange_info)
+            if removed_symbols := self._symbols - symbols:
+                await self._remove_symbols(removed_symbols, exchange_info)
 
     async def _listen_data(self, exchange_info: dict[str, ExchangeInfoSchema], depth_available: asyncio.Event) -> None:
         async for data in self._api.listen_data(self._symbols, exchange_info=exchange_info):
-            if isinstance(data, DepthEventSchema):
+            if isinstance(data, BookTickerEventSchema):
+                self._data_sender.put_book_ticker(data.symbol, data.record)
+                self._publisher.publish(DataTypeEnum.BOOK_TICKER, data.symbol, data.record)
+            elif isinstance(data, DepthEventSchema):
                 self._data.update_depth_events(data)
                 is_depth_available = depth_available.is_set()
-                if is_depth_available and self._data.depth_results:
+                if is_depth_available and data.symbol in self._data.depth_results:
                     try:
-                        self._calculate_depth(data)
+                        with check_speed("loader.calculate_depth", log=False):
+                            self._calculate_depth(data)
                     except ValueError:
                         self._data.reset()
                         break
                 elif not is_depth_available and self._data.depth_events.keys() == self._symbols:
                     depth_available.set()
+                elif self._new_symbols and self._new_symbols <= self._data.depth_events.keys():
+                    self._new_symbols_available.set()
             elif isinstance(data, AggTradeEventSchema):
-                self._calculate_agg_trade(data)
+                with check_speed("loader.calculate_agg_trade", log=False):
+                    self._check_agg_trade(data, exchange_info)
 
     async def run(self) -> None:
+        await self._publisher.start()
         while True:
             try:
                 self._logger.info("start task")
                 depth_available = asyncio.Event()
                 exchange_info = await self._api.get_info(self._symbols)
+                self._send_exchange_info(exchange_info)
                 task = create_safe_task(self._listen_data(exchange_info, depth_available), logger=self._logger)
                 await asyncio.wait_for(depth_available.wait(), timeout=10)
                 tasks = (
@@ -146,13 +374,16 @@ class LoaderService:
                 )
                 depth_symbols = await asyncio.gather(*tasks)
                 self._data.init_depth_results(depth_symbols)
+                config_task = create_safe_task(self._watch_config(exchange_info), logger=self._logger)
                 await task
+                config_task.cancel()
             except TimeoutError:
                 self._logger.error("depth_available is not available... restart", exc_info=False)
                 self._logger.info("closing loader")
-                self._data_queue.put(None)
+                self._data_sender.close()
                 break
             except asyncio.CancelledError:
                 self._logger.info("closing loader")
-                self._data_queue.put(None)
+                self._data_sender.close()
                 break
+        await self._publisher.stop()
@@ -0,0 +1,145 @@
+import asyncio
+import contextlib
+import logging
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+import msgpack  # type: ignore [import-untyped]
+
+from src.core.enums import DataTypeEnum
+from src.core.settings import Settings
+from src.core.types import DictStrAny
+
+_READ_SIZE = 4096
+
+
+class _Subscriber:
+    __slots__ = ("data_types", "queue", "symbols", "writer")
+
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        *,
+        symbols: set[str],
+        data_types: set[str],
+        queue_size: int,
+    ) -> None:
+        self.writer = writer
+        self.symbols = symbols
+        self.data_types = data_types
+        self.queue: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=queue_size)
+
+    def accepts(self, data_type: str, symbol: str) -> bool:
+        return data_type in self.data_types and (not self.symbols or symbol in self.symbols)
+
+
+class PublisherService:
+    def __init__(self, *, settings: Settings) -> None:
+        self._logger = logging.getLogger()
+        socket_path = settings.loader.publisher.socket_path
+        self._socket_path = Path(socket_path) if socket_path is not None else None
+        self._queue_size = settings.loader.publisher.subscriber_queue_size
+        self._subscribers: set[_Subscriber] = set()
+        self._snapshots: dict[str, DictStrAny] = {}
+        self._server: asyncio.Server | None = None
+
+    def _disconnect(self, subscriber: _Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+        subscriber.writer.transport.abort()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> DictStrAny:
+        unpacker = msgpack.Unpacker()
+        while True:
+            chunk = await reader.read(_READ_SIZE)
+            if not chunk:
+                raise ConnectionResetError
+            unpacker.feed(chunk)
+            with contextlib.suppress(msgpack.OutOfData):
+                return unpacker.unpack()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        subscriber = None
+        try:
+            request = await self._read_request(reader)
+            subscriber = _Subscriber(
+                writer,
+                symbols=set(request.get("symbols") or ()),
+                data_types=set(request.get("data_types") or DataTypeEnum),
+                queue_size=self._queue_size,
+            )
+            for symbol, snapshot in self._snapshots.items():
+                if subscriber.accepts(DataTypeEnum.DEPTH, symbol):
+                    subscriber.queue.put_nowait(msgpack.packb(snapshot, default=str))
+            self._subscribers.add(subscriber)
+            self._logger.info("subscriber connected: %s", request)
+            while (packed := await subscriber.queue.get()) is not None:
+                writer.write(packed)
+                await writer.drain()
+        except (ConnectionError, ValueError, asyncio.QueueFull) as e:
+            self._logger.warning("subscriber error: %s", e)
+        finally:
+            if subscriber is not None:
+                self._subscribers.discard(subscriber)
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def start(self) -> None:
+        if self._socket_path is None:
+            return
+        self._socket_path.unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(self._handle_client, path=self._socket_path)
+        self._logger.info("publisher is listening on %s", self._socket_path)
+
+    async def stop(self) -> None:
+        for subscriber in list(self._subscribers):
+            self._disconnect(subscriber)
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        if self._socket_path is not None:
+            self._socket_path.unlink(missing_ok=True)
+
+    def remove_symbol(self, symbol: str) -> None:
+        self._snapshots.pop(symbol, None)
+
+    def publish(self, data_type: str, symbol: str, record: DictStrAny | bytes) -> None:
+        if self._server is None:
+            return
+        if data_type == DataTypeEnum.DEPTH and isinstance(record, dict):
+            self._snapshots[symbol] = record
+        packed = None
+        for subscriber in list(self._subscribers):
+            if not subscriber.accepts(data_type, symbol):
+                continue
+            if packed is None:
+                packed = msgpack.packb(record, default=str)
+            try:
+                subscriber.queue.put_nowait(packed)
+            except asyncio.QueueFull:
+                self._logger.warning("subscriber is too slow, disconnecting")
+                self._disconnect(subscriber)
+
+
+async def subscribe(
+    socket_path: Path,
+    *,
+    symbols: list[str] | None = None,
+    data_types: list[DataTypeEnum] | None = None,
+) -> AsyncGenerator[DictStrAny | bytes]:
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    try:
+        writer.write(msgpack.packb({"symbols": symbols, "data_types": data_types}))
+        await writer.drain()
+        unpacker = msgpack.Unpacker()
+        while chunk := await reader.read(_READ_SIZE):
+            unpacker.feed(chunk)
+            for record in unpacker:
+                yield record
+    finally:
+        writer.close()
+        with contextlib.suppress(ConnectionError):
+            await writer.wait_closed()
@@ -0,0 +1,185 @@
+import logging
+import shutil
+import time
+from queue import Full
+from typing import BinaryIO
+
+import msgpack  # type: ignore [import-untyped]
+
+from src.core.enums import DataTypeEnum, QueuePolicyEnum
+from src.core.settings import Settings
+from src.core.types import DictStrAny
+from src.schemas.load_data import LoadDataQueue
+
+
+class LoadDataSender:
+    _SPILL_CHUNK_SIZE = 1 << 16
+    _STATS_INTERVAL = 60
+
+    def __init__(self, data_queue: LoadDataQueue, *, settings: Settings) -> None:
+        self._logger = logging.getLogger()
+        self._data_queue = data_queue
+        self._depth_policy = settings.loader.queue.depth_policy
+        self._agg_trade_policy = settings.loader.queue.agg_trade_policy
+        self._book_ticker_policy = settings.loader.queue.book_ticker_policy
+        self._spill_path = settings.data_dir / "overflow" / "agg_trade.msgpack"
+        self._spill_writer: BinaryIO | None = None
+        self._spill_reader: BinaryIO | None = None
+        self._spill_unpacker = msgpack.Unpacker()
+        self._spill_head: DictStrAny | None = None
+        self._spill_size = 0
+        self._pending: dict[tuple[DataTypeEnum, str], DictStrAny | bytes] = {}
+        self._conflated_count = 0
+        self._dropped_count = 0
+        self._spilled_count = 0
+        self._stats_logged_at = time.monotonic()
+        self._recover_spill()
+
+    def _open_spill(self) -> BinaryIO:
+        self._spill_path.parent.mkdir(parents=True, exist_ok=True)
+        spill_writer = self._spill_path.open("ab")
+        self._spill_writer = spill_writer
+        self._spill_reader = self._spill_path.open("rb")
+        self._spill_unpacker = msgpack.Unpacker()
+        return spill_writer
+
+    def _recover_spill(self) -> None:
+        if not self._spill_path.exists():
+            return
+        spill_size = 0
+        offset = 0
+        with self._spill_path.open("rb") as stream:
+            unpacker = msgpack.Unpacker(stream)
+            try:
+                for _ in unpacker:
+                    spill_size += 1
+                    offset = unpacker.tell()
+            except ValueError:
+                corrupted_path = self._spill_path.with_suffix(".corrupted")
+                shutil.copyfile(self._spill_path, corrupted_path)
+                self._logger.exception("spill file is corrupted, saved to %s", corrupted_path)
+        if not spill_size:
+            self._spill_path.unlink()
+            return
+        with self._spill_path.open("r+b") as stream:
+            stream.truncate(offset)
+        self._open_spill()
+        self._spill_size = spill_size
+        self._logger.warning("replaying %d agg trades left in %s", spill_size, self._spill_path)
+
+    def _try_put(self, record: DictStrAny | bytes) -> bool:
+        try:
+            self._data_queue.put_nowait(record)
+        except Full:
+            return False
+        return True
+
+    def _spill(self, record: DictStrAny) -> None:
+        spill_writer = self._spill_writer
+        if spill_writer is None:
+            spill_writer = self._open_spill()
+            self._logger.warning("data queue is full, spilling agg trades to %s", self._spill_path)
+        spill_writer.write(msgpack.packb(record, default=str))
+        self._spill_size += 1
+        self._spilled_count += 1
+
+    def _read_spilled(self) -> DictStrAny:
+        if self._spill_writer is None or self._spill_reader is None:
+            msg = "spill file is not open"
+            raise RuntimeError(msg)
+        while True:
+            try:
+                return self._spill_unpacker.unpack()
+            except msgpack.OutOfData:
+                self._spill_writer.flush()
+                self._spill_unpacker.feed(self._spill_reader.read(self._SPILL_CHUNK_SIZE))
+
+    def _close_spill(self) -> None:
+        if self._spill_writer is not None and self._spill_reader is not None:
+            self._spill_writer.close()
+            self._spill_reader.close()
+            self._spill_path.unlink(missing_ok=True)
+            self._spill_writer = None
+            self._spill_reader = None
+
+    def _flush_spill(self, *, block: bool = False) -> bool:
+        while self._spill_size:
+            if self._spill_head is None:
+                self._spill_head = self._read_spilled()
+            if block:
+                self._data_queue.put(self._spill_head)
+            elif not self._try_put(self._spill_head):
+                return False
+            self._spill_head = None
+            self._spill_size -= 1
+        self._close_spill()
+        return True
+
+    def _flush(self, *, block: bool = False) -> None:
+        if not self._flush_spill(block=block):
+            return
+        for key in list(self._pending):
+            if block:
+                self._data_queue.put(self._pending[key])
+            elif not self._try_put(self._pending[key]):
+                return
+            del self._pending[key]
+
+    def _log_stats(self, *, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._stats_logged_at < self._STATS_INTERVAL:
+            return
+        self._stats_logged_at = now
+        if self._conflated_count or self._dropped_count or self._spilled_count:
+            self._logger.warning(
+                "data queue backpressure: conflated=%d dropped=%d spilled=%d pending_spill=%d",
+                self._conflated_count,
+                self._dropped_count,
+                self._spilled_count,
+                self._spill_size,
+            )
+
+    def _put_conflated(
+        self,
+        key: tuple[DataTypeEnum, str],
+        record: DictStrAny | bytes,
+        *,
+        policy: QueuePolicyEnum,
+    ) -> None:
+        self._flush()
+        self._log_stats()
+        if policy == QueuePolicyEnum.BLOCK:
+            self._data_queue.put(record)
+            return
+        if key not in self._pending and self._try_put(record):
+            return
+        if policy == QueuePolicyEnum.DROP:
+            self._dropped_count += 1
+            return
+        if key in self._pending:
+            self._conflated_count += 1
+        self._pending[key] = record
+
+    def put_depth(self, symbol: str, record: DictStrAny) -> None:
+        self._put_conflated((DataTypeEnum.DEPTH, symbol), record, policy=self._depth_policy)
+
+    def put_book_ticker(self, symbol: str, record: bytes) -> None:
+        self._put_conflated((DataTypeEnum.BOOK_TICKER, symbol), record, policy=self._book_ticker_policy)
+
+    def put_agg_trade(self, record: DictStrAny) -> None:
+        self._flush()
+        self._log_stats()
+        if self._agg_trade_policy == QueuePolicyEnum.BLOCK:
+            self._data_queue.put(record)
+            return
+        if not self._spill_size and self._try_put(record):
+            return
+        self._spill(record)
+
+    def put_exchange_info(self, symbol: str, record: DictStrAny) -> None:
+        self._put_conflated((DataTypeEnum.EXCHANGE_INFO, symbol), record, policy=QueuePolicyEnum.CONFLATE)
+
+    def close(self) -> None:
+        self._flush(block=True)
+        self._log_stats(force=True)
+        self._data_queue.put(None)
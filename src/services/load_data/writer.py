@@ -8,8 +8,10 @@ from typing import Self
 import msgpack  # type: ignore [import-untyped]
 
 from src.core.enums import DataTypeEnum
+from src.core.latency import LatencyTracker, add_stamp
 from src.core.settings import Settings
 from src.core.types import DictStrAny
+from src.core.utils import check_speed
 from src.schemas.load_data import LoadDataQueue
 
 
@@ -20,28 +22,29 @@ class FileWriter:
         return utc_now.strftime("%Y-%m-%dT%H")
 
     @classmethod
-    def _create_file(cls, data_dir: Path, current_hour: str) -> BufferedWriter:
-        file_path = data_dir / f"{current_hour}.msgpack"
+    def _create_file(cls, data_dir: Path, current_hour: str, suffix: str) -> BufferedWriter:
+        file_path = data_dir / f"{current_hour}{suffix}"
         file_path.parent.mkdir(parents=True, exist_ok=True)
         return file_path.open("ab")
 
     @classmethod
-    def create(cls, data_dir: Path) -> Self:
+    def create(cls, data_dir: Path, *, suffix: str = ".msgpack") -> Self:
         current_hour = cls._get_utc_hour()
-        file = cls._create_file(data_dir, current_hour)
-        return cls(file, data_dir=data_dir, current_hour=current_hour)
+        file = cls._create_file(data_dir, current_hour, suffix)
+        return cls(file, data_dir=data_dir, current_hour=current_hour, suffix=suffix)
 
-    def __init__(self, file: BufferedWriter, *, data_dir: Path, current_hour: str) -> None:
+    def __init__(self, file: BufferedWriter, *, data_dir: Path, current_hour: str, suffix: str) -> None:
         self._file = file
         self._data_dir = data_dir
         self._current_hour = current_hour
+        self._suffix = suffix
 
     def _check_rotation(self) -> None:
         current_hour = self._get_utc_hour()
         if current_hour != self._current_hour:
             self._file.close()
             self._current_hour = current_hour
-            self._file = self._create_file(self._data_dir, current_hour)
+            self._file = self._create_file(self._data_dir, current_hour, self._suffix)
 
     def write(self, data: DictStrAny) -> None:
         self._check_rotation()
@@ -49,6 +52,13 @@ class FileWriter:
         self._file.write(packed)
         self._file.flush()
 
+    def write_raw(self, data: bytes) -> None:
+        self._check_rotation()
+        self._file.write(data)
+
+    def flush(self) -> None:
+        self._file.flush()
+
     def close(self) -> None:
         self._file.close()
 
@@ -58,24 +68,43 @@ class WriterService:
         self._logger = logging.getLogger()
         self._data_queue = data_queue
         self._settings = settings
+        self._latency_tracker = LatencyTracker(report_interval=settings.loader.latency_report_interval)
+
+    def _write_record(self, data: DictStrAny, writers: dict[str, FileWriter]) -> None:
+        stamps = data.get("l")
+        add_stamp(stamps)
+        data_type = data.pop("e")
+        msg = f"Writing data: {data_type}"
+        self._logger.info(msg)
+        if writer := writers.get(data_type):
+            with check_speed("writer.write", log=False):
+                writer.write(data)
+        if stamps is not None:
+            written_stamps = stamps.copy()
+            add_stamp(written_stamps)
+            self._latency_tracker.add(data["t"], written_stamps)
 
     def run(self) -> None:
-        depth_writer = FileWriter.create(self._settings.data_dir / DataTypeEnum.DEPTH)
-        agg_trade_writer = FileWriter.create(self._settings.data_dir / DataTypeEnum.AGG_TRADE)
+        writers: dict[str, FileWriter] = {
+            data_type: FileWriter.create(self._settings.data_dir / data_type)
+            for data_type in (DataTypeEnum.DEPTH, DataTypeEnum.AGG_TRADE, DataTypeEnum.EXCHANGE_INFO)
+        }
+        if self._settings.loader.book_ticker:
+            book_ticker_dir = self._settings.data_dir / DataTypeEnum.BOOK_TICKER
+            writers[DataTypeEnum.BOOK_TICKER] = FileWriter.create(book_ticker_dir, suffix=".bin")
         try:
             while True:
                 try:
                     data = self._data_queue.get(timeout=1)
                     if data is None:
                         break
-                    data_type = data.pop("e")
-                    msg = f"Writing data: {data_type}"
-                    self._logger.info(msg)
-                    if data_type == DataTypeEnum.DEPTH:
-                        depth_writer.write(data)
-                    elif data_type == DataTypeEnum.AGG_TRADE:
-                        agg_trade_writer.write(data)
+                    if isinstance(data, bytes):
+                        writers[DataTypeEnum.BOOK_TICKER].write_raw(data)
+                    else:
+                        self._write_record(data, writers)
                 except Empty:
+                    for writer in writers.values():
+                        writer.flush()
                     continue
                 except KeyboardInterrupt:
                     pass
@@ -84,5 +113,6 @@ class WriterService:
                     self._logger.error(msg)
         finally:
             self._logger.info("Closing writer")
-            depth_writer.close()
-            agg_trade_writer.close()
+            self._latency_tracker.report()
+            for writer in writers.values():
+                writer.close()